@@ -1,15 +1,48 @@
 # agents/categorize_agent.py
 
 from config import client  # Import centralized AzureOpenAI client
+from agents.taxonomy_agent import as_text
+from functools import lru_cache
+import json
 import os
+import re
+import tiktoken
 
-def categorize_case_study(text: str) -> dict:
+UNKNOWN_CATEGORIZATION = {
+    "summary": "Unknown",
+    "domain": "Unknown",
+    "category": "Unknown",
+    "technology": "Unknown"
+}
+CATEGORIZATION_FIELDS = tuple(UNKNOWN_CATEGORIZATION)
+
+
+def _with_text_fields(result: dict) -> dict:
+    # The model may send a list ("technology": ["Azure", "SQL"]) or null;
+    # everything downstream expects strings
+    return {**result, **{field: as_text(result.get(field)) for field in CATEGORIZATION_FIELDS}}
+
+# Batched mode packs small documents into one request up to this many
+# document tokens, and at most this many documents (bounds the output size)
+BATCH_TOKEN_BUDGET = int(os.getenv("CATEGORIZE_BATCH_TOKENS", "6000"))
+MAX_BATCH_DOCUMENTS = int(os.getenv("CATEGORIZE_BATCH_MAX_DOCS", "10"))
+
+CONFIDENCE_INSTRUCTIONS = """
+    Also rate your confidence in the Category, Domain and Technology between 0 and 1,
+    as "category_confidence", "domain_confidence" and "technology_confidence"
+    fields in the JSON response.
+    """
+
+def categorize_case_study(text: str, include_confidence: bool = False) -> dict:
     """
     Categorizes a case study into:
     - Summary
     - Category
     - Domain
     - Technology
+
+    With include_confidence, the same structured-output call also returns the
+    validation confidence scores, so no separate validation call is needed.
     """
     prompt = f"""
     You are a case study classification assistant.
@@ -31,18 +64,150 @@ def categorize_case_study(text: str) -> dict:
     }}
     """
 
+    if include_confidence:
+        prompt += CONFIDENCE_INSTRUCTIONS
+
+    # JSON mode: the reply is parsed strictly, so prose around it would
+    # otherwise turn the whole result into "Unknown"
+    response = client.chat.completions.create(
+        model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"),
+        messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=0
+    )
+
+    try:
+        result = parse_json_response(response.choices[0].message.content)
+    except ValueError:
+        result = None
+    return _with_text_fields(result) if isinstance(result, dict) else dict(UNKNOWN_CATEGORIZATION)
+
+
+def parse_json_response(content: str):
+    """
+    Strictly parses a JSON model response, tolerating only a Markdown code
+    fence around it. Raises ValueError on anything else.
+    """
+    content = (content or "").strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", content, re.DOTALL)
+    if fenced:
+        content = fenced.group(1)
+    return json.loads(content)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        try:
+            return tiktoken.encoding_for_model(os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"))
+        except KeyError:
+            # Azure deployment names need not match a model name
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; without network
+        # access, fall back to an estimate rather than failing uploads
+        print(f"Token encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class BatchPacker:
+    """
+    Incrementally groups documents into batches whose combined text fits in
+    token_budget (and at most MAX_BATCH_DOCUMENTS). A document larger than
+    the budget gets a batch of its own; a budget of 0 never batches.
+    """
+    def __init__(self, token_budget: int = BATCH_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.current = {}
+        self.current_tokens = 0
+
+    def add(self, key, text: str):
+        """Adds a document; returns the batch ({key: text}) it closed, if any."""
+        tokens = count_tokens(text) if self.token_budget > 0 else 0
+        closed = None
+        if self.current and (self.token_budget <= 0
+                             or self.current_tokens + tokens > self.token_budget
+                             or len(self.current) >= MAX_BATCH_DOCUMENTS):
+            closed = self.flush()
+        self.current[key] = text
+        self.current_tokens += tokens
+        return closed
+
+    def flush(self):
+        """Returns the open batch (or None) and starts a new one."""
+        batch, self.current, self.current_tokens = self.current or None, {}, 0
+        return batch
+
+
+def categorize_batch(texts: dict, include_confidence: bool = False) -> dict:
+    """
+    Categorizes several small case studies in a single request.
+
+    texts maps any key (e.g. file name) to the document text; returns the same
+    keys mapped to categorize_case_study-shaped results. Items missing from,
+    or malformed in, the model's response fall back to a per-document call;
+    errors from the API itself are raised so the caller can retry the batch.
+    """
+    if len(texts) <= 1:
+        return {key: categorize_case_study(text, include_confidence) for key, text in texts.items()}
+
+    # Short ids keep arbitrary file names out of the prompt
+    ids = {f"doc-{i}": key for i, key in enumerate(texts, start=1)}
+    documents = "\n\n".join(
+        f'<case_study id="{doc_id}">\n{texts[key]}\n</case_study>' for doc_id, key in ids.items()
+    )
+    fields = list(CATEGORIZATION_FIELDS)
+    if include_confidence:
+        fields += ["category_confidence", "domain_confidence", "technology_confidence"]
+    prompt = f"""
+    You are a case study classification assistant.
+    For EACH case study below, provide:
+    1. A concise summary (3-5 sentences).
+    2. The Category (business area).
+    3. The Domain (industry).
+    4. The Technology (tools, platforms, or techniques used).
+    {CONFIDENCE_INSTRUCTIONS if include_confidence else ""}
+    {documents}
+
+    Respond in JSON with one entry per case study, keyed by its id:
+    {{
+        "results": [
+            {{"id": "doc-1", {", ".join(f'"{f}": ...' for f in fields)}}}
+        ]
+    }}
+    """
+
+    # API errors (rate limits, timeouts) propagate: falling back to one call
+    # per document would multiply the load just when the API is throttling
     response = client.chat.completions.create(
         model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"),
         messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"},
         temperature=0
     )
 
     try:
-        return eval(response.choices[0].message.content.strip())
-    except Exception:
-        return {
-            "summary": "Unknown",
-            "domain": "Unknown",
-            "category": "Unknown",
-            "technology": "Unknown"
-        }
+        items = parse_json_response(response.choices[0].message.content)["results"]
+    except (ValueError, KeyError, TypeError):
+        # Unparseable reply: every item falls back below
+        items = []
+
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        key = ids.get(item.get("id"))
+        if key is not None and all(f in item for f in CATEGORIZATION_FIELDS):
+            results[key] = _with_text_fields({f: item[f] for f in fields if f in item})
+
+    for key, text in texts.items():
+        if key not in results:
+            results[key] = categorize_case_study(text, include_confidence)
+    return results
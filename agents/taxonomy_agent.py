@@ -0,0 +1,110 @@
+# agents/taxonomy_agent.py
+
+"""
+Fast local confidence scoring for categorization results.
+
+Scores category/domain/technology against a taxonomy learned from existing
+metadata (fuzzy matching) and against the source text (token overlap), so
+only low-confidence results need an LLM validation call.
+"""
+
+import re
+from collections import Counter
+from difflib import SequenceMatcher, get_close_matches
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+FUZZY_CUTOFF = 0.6
+# How much a known label counts without support in the source text
+TAXONOMY_WEIGHT = 0.6
+# Text tokens sharing this many leading characters count as a match
+# (finance/financial, pharmacy/pharmaceutical)
+PREFIX_LEN = 5
+STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with",
+             "management", "services", "solutions"}
+
+
+def as_text(value) -> str:
+    """
+    Coerces a label from model JSON to a string: lists (e.g. several
+    technologies) are joined with ", " and None becomes "".
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(t for t in (as_text(v) for v in value) if t)
+    return str(value)
+
+
+def _normalize(value) -> str:
+    return " ".join(TOKEN_RE.findall(as_text(value).lower()))
+
+
+def _split_technologies(technology) -> list:
+    items = re.split(r"[,;/\n]|\band\b", as_text(technology))
+    return [n for n in (_normalize(item) for item in items) if n]
+
+
+def build_taxonomy(metadata: list) -> dict:
+    """
+    Learns the known categories, domains and technologies (with frequencies)
+    from existing metadata records.
+    """
+    taxonomy = {"category": Counter(), "domain": Counter(), "technology": Counter()}
+    for m in metadata:
+        for field in ("category", "domain"):
+            value = _normalize(m.get(field, ""))
+            if value and value != "unknown":
+                taxonomy[field][value] += 1
+        for tech in _split_technologies(m.get("technology", "")):
+            taxonomy["technology"][tech] += 1
+    return taxonomy
+
+
+def _taxonomy_score(value: str, known: Counter) -> float:
+    if not known:
+        return 0.0
+    if value in known:
+        return 1.0
+    match = get_close_matches(value, known.keys(), n=1, cutoff=FUZZY_CUTOFF)
+    return SequenceMatcher(None, value, match[0]).ratio() if match else 0.0
+
+
+def _text_overlap(value: str, text_tokens: set, text_prefixes: set) -> float:
+    tokens = [t for t in value.split() if t not in STOPWORDS] or value.split()
+    if not tokens:
+        return 0.0
+    hits = sum(t in text_tokens or (len(t) >= PREFIX_LEN and t[:PREFIX_LEN] in text_prefixes)
+               for t in tokens)
+    return hits / len(tokens)
+
+
+def _field_score(value: str, known: Counter, text_tokens: set, text_prefixes: set) -> float:
+    # Support in the source text is required for a high score: a label the
+    # corpus already uses but the text never mentions stays below the
+    # threshold, while a new label the text fully supports can pass
+    overlap = _text_overlap(value, text_tokens, text_prefixes)
+    blended = TAXONOMY_WEIGHT * _taxonomy_score(value, known) + (1 - TAXONOMY_WEIGHT) * overlap
+    return max(blended, overlap)
+
+
+def score_locally(categorization: dict, text: str, taxonomy: dict) -> dict:
+    """
+    Returns confidence scores (0-1) in the same shape as validate_case_study.
+    """
+    text_tokens = set(TOKEN_RE.findall((text or "").lower()))
+    text_prefixes = {t[:PREFIX_LEN] for t in text_tokens if len(t) >= PREFIX_LEN}
+    scores = {}
+    for field in ("category", "domain"):
+        value = _normalize(categorization.get(field, ""))
+        if not value or value == "unknown":
+            scores[f"{field}_confidence"] = 0.0
+        else:
+            scores[f"{field}_confidence"] = round(_field_score(value, taxonomy[field], text_tokens, text_prefixes), 2)
+
+    techs = _split_technologies(categorization.get("technology", ""))
+    if not techs or techs == ["unknown"]:
+        scores["technology_confidence"] = 0.0
+    else:
+        tech_scores = [_field_score(t, taxonomy["technology"], text_tokens, text_prefixes) for t in techs]
+        scores["technology_confidence"] = round(sum(tech_scores) / len(tech_scores), 2)
+    return scores
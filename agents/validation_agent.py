@@ -1,8 +1,17 @@
 # agents/validation_agent.py
 
 from config import client  # Import the shared AzureOpenAI client
+from agents.taxonomy_agent import score_locally
 import os
 
+CONFIDENCE_FIELDS = ("category_confidence", "domain_confidence", "technology_confidence")
+
+# Local scores at or above this skip the LLM validation call
+VALIDATION_CONFIDENCE_THRESHOLD = float(os.getenv("VALIDATION_CONFIDENCE_THRESHOLD", "0.8"))
+# Ask categorize_case_study for confidences in the same call instead of
+# making a separate validation call for low-confidence results
+MERGED_VALIDATION = os.getenv("MERGED_VALIDATION", "false").lower() == "true"
+
 def validate_case_study(category: str, domain: str, technology: str) -> dict:
     """
     Validates extracted case study details and gives confidence scores (0-1).
@@ -37,3 +46,39 @@ def validate_case_study(category: str, domain: str, technology: str) -> dict:
             "domain_confidence": 0.0,
             "technology_confidence": 0.0
         }
+
+
+def local_validation(categorization: dict, text: str, taxonomy: dict):
+    """
+    The tiers that need no extra LLM call: the local taxonomy score when it is
+    confident, else LLM confidences already in the categorization
+    (categorize_case_study(..., include_confidence=True)). Returns None when
+    the result has to be escalated to validate_case_study.
+    """
+    local = score_locally(categorization, text, taxonomy)
+    if min(local.values()) >= VALIDATION_CONFIDENCE_THRESHOLD:
+        return local
+
+    if all(field in categorization for field in CONFIDENCE_FIELDS):
+        try:
+            return {field: float(categorization[field]) for field in CONFIDENCE_FIELDS}
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def validate_tiered(categorization: dict, text: str, taxonomy: dict) -> dict:
+    """
+    Tiered validation: scores the categorization locally against the taxonomy
+    and the source text, and only falls back to the LLM when neither the local
+    tier nor the categorization call itself is confident.
+    """
+    validation = local_validation(categorization, text, taxonomy)
+    if validation is not None:
+        return validation
+
+    return validate_case_study(
+        categorization.get("category", ""),
+        categorization.get("domain", ""),
+        categorization.get("technology", "")
+    )
@@ -12,6 +12,7 @@ from config import llm, loader, embedding_model, client
 from agents.reader_agent import process_case_study
 from agents.categorize_agent import categorize_case_study
 from agents.validation_agent import validate_case_study
+from metadata_store import replace_metadata
 
 # Constants
 METADATA_FILE = "metadata.json"
@@ -99,9 +100,8 @@ if page == "Categorizer & Validator":
         st.session_state.all_metadata = all_metadata
         st.session_state.all_validation = all_validation
 
-        # Save to files
-        with open(METADATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_metadata, f, indent=4, ensure_ascii=False)
+        # Save to files (through the store, so the API sees a new corpus version)
+        replace_metadata(all_metadata)
         with open(VALIDATION_FILE, "w", encoding="utf-8") as f:
             json.dump(all_validation, f, indent=4, ensure_ascii=False)
 
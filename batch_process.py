@@ -0,0 +1,273 @@
+# batch_process.py
+
+"""
+Offline batch runner for bulk corpus processing.
+
+Walks a directory (LOCAL_FILE_DIR by default) or a manifest of file paths and
+runs each file through process_case_study -> categorize_batch ->
+validate_tiered. Text extraction runs in a process pool and feeds the LLM
+stage as files finish, so the two overlap. Small documents are packed into
+batched categorization requests up to a token budget, and every LLM call
+(batched categorization and escalated validation) shares one bounded pool
+of concurrency slots. Results are streamed to a JSONL
+file, one record per line, which doubles as the checkpoint: re-running with the
+same output file skips every file already written, so an interrupted run
+resumes where it stopped.
+
+Usage:
+    python batch_process.py --output results.jsonl
+    python batch_process.py --manifest files.txt --output results.jsonl --concurrency 16
+    python batch_process.py --batch-tokens 0   # one categorization request per file
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from agents.reader_agent import process_case_study
+from agents.categorize_agent import categorize_batch, BatchPacker, BATCH_TOKEN_BUDGET
+from agents.validation_agent import local_validation, validate_case_study, MERGED_VALIDATION
+from agents.taxonomy_agent import build_taxonomy
+from metadata_store import load_metadata
+
+load_dotenv()
+
+SUPPORTED_EXTENSIONS = (".pdf", ".pptx")
+
+
+def list_files(directory: str) -> list:
+    """Recursively lists supported case study files under a directory."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def read_manifest(manifest: str) -> list:
+    """Reads one file path per line, ignoring blank lines and # comments."""
+    with open(manifest, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def load_checkpoint(output: str) -> set:
+    """Returns the source paths already written to the output JSONL."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["source_path"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def truncate_partial_line(output: str):
+    """
+    A run killed mid-write can leave a last line without its newline. Drop it
+    so the next run's appends start on a fresh line; that file is retried.
+    """
+    if not os.path.exists(output):
+        return
+    with open(output, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos, keep = end, 0
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                keep = pos + newline + 1
+                break
+        if keep < end:
+            f.truncate(keep)
+
+
+def extract_text(path: str) -> str:
+    """Runs in a worker process: reads the file and extracts its text."""
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    case_text, _ = process_case_study(os.path.basename(path), file_bytes)
+    return case_text
+
+
+def build_record(path: str, categorization: dict, validation: dict) -> dict:
+    return {
+        "file_name": os.path.basename(path),
+        "source_path": path,
+        "summary": categorization.get("summary", ""),
+        "category": categorization.get("category", ""),
+        "domain": categorization.get("domain", ""),
+        "technology": categorization.get("technology", ""),
+        **validation
+    }
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    """Prints throughput and ETA after each finished file."""
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def update(self, failed: bool = False):
+        self.done += 1
+        self.failed += failed
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        print(
+            f"[{self.done}/{self.total}] {rate:.2f} files/s, "
+            f"{self.failed} failed, ETA {format_eta(eta)}",
+            flush=True
+        )
+
+
+async def run_batch(paths: list, output: str, workers: int, concurrency: int, batch_tokens: int):
+    truncate_partial_line(output)
+    done = load_checkpoint(output)
+    pending = [p for p in paths if p not in done]
+    print(f"📁 {len(paths)} files, {len(paths) - len(pending)} already processed, {len(pending)} to go", flush=True)
+    if not pending:
+        return
+
+    taxonomy = build_taxonomy(load_metadata())
+    progress = Progress(len(pending))
+    loop = asyncio.get_running_loop()
+    # The agents use the blocking client, so each LLM slot is a thread. A
+    # dedicated pool: the loop's default executor may have fewer threads
+    # than --concurrency
+    llm_slots = asyncio.Semaphore(concurrency)
+    # Bounds packed batches waiting for a slot, so extraction cannot run
+    # arbitrarily far ahead of the LLM stage
+    queued_batches = asyncio.Semaphore(concurrency * 2)
+    path_queue = asyncio.Queue()
+    for path in pending:
+        path_queue.put_nowait(path)
+    extracted = asyncio.Queue(maxsize=workers * 2)
+    analyses = set()
+
+    def fail(path, e):
+        # Failed files are not checkpointed, so a rerun retries them
+        print(f"❌ {path}: {e}", flush=True)
+        progress.update(failed=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as llm_threads, \
+            open(output, "a", encoding="utf-8") as out:
+        async def extractor():
+            while True:
+                try:
+                    path = path_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    text = await loop.run_in_executor(pool, extract_text, path)
+                except Exception as e:
+                    fail(path, e)
+                    continue
+                await extracted.put((path, text))
+
+        async def extract_all():
+            await asyncio.gather(*(extractor() for _ in range(workers)))
+            await extracted.put(None)
+
+        async def validate(path, text, categorization):
+            validation = local_validation(categorization, text, taxonomy)
+            if validation is None:
+                async with llm_slots:
+                    validation = await loop.run_in_executor(
+                        llm_threads,
+                        validate_case_study,
+                        categorization.get("category", ""),
+                        categorization.get("domain", ""),
+                        categorization.get("technology", "")
+                    )
+            return build_record(path, categorization, validation)
+
+        async def analyze(texts):
+            try:
+                async with llm_slots:
+                    categorizations = await loop.run_in_executor(
+                        llm_threads, categorize_batch, texts, MERGED_VALIDATION
+                    )
+            except Exception as e:
+                for path in texts:
+                    fail(path, e)
+                return
+            finally:
+                queued_batches.release()
+
+            # Escalated validations go back through the slots concurrently
+            records = await asyncio.gather(
+                *(validate(path, text, categorizations[path]) for path, text in texts.items()),
+                return_exceptions=True
+            )
+            for path, record in zip(texts, records):
+                if isinstance(record, Exception):
+                    fail(path, record)
+                    continue
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                progress.update()
+            out.flush()
+
+        async def dispatch(batch):
+            await queued_batches.acquire()
+            task = asyncio.create_task(analyze(batch))
+            analyses.add(task)
+            task.add_done_callback(analyses.discard)
+
+        # Pack documents as extraction finishes them; a batch is sent as soon
+        # as the next document would overflow it
+        packer = BatchPacker(batch_tokens)
+        producer = asyncio.create_task(extract_all())
+        while (item := await extracted.get()) is not None:
+            batch = packer.add(*item)
+            if batch:
+                await dispatch(batch)
+        batch = packer.flush()
+        if batch:
+            await dispatch(batch)
+        await producer
+        await asyncio.gather(*list(analyses))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-process case study files into JSONL metadata.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--input-dir", default=os.getenv("LOCAL_FILE_DIR", "./case_studies"),
+                        help="Directory to walk for PDF/PPTX files (default: LOCAL_FILE_DIR)")
+    source.add_argument("--manifest", help="Text file with one file path per line")
+    parser.add_argument("--output", default="batch_results.jsonl",
+                        help="JSONL output; also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Processes used for text extraction")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum concurrent LLM requests")
+    parser.add_argument("--batch-tokens", type=int, default=BATCH_TOKEN_BUDGET,
+                        help="Token budget for packing small documents into one "
+                             "categorization request (0 disables batching)")
+    args = parser.parse_args()
+
+    paths = read_manifest(args.manifest) if args.manifest else list_files(args.input_dir)
+    asyncio.run(run_batch(paths, args.output, args.workers, args.concurrency, args.batch_tokens))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
 from langchain_community.document_loaders import AzureBlobStorageContainerLoader
 from langchain.embeddings import AzureOpenAIEmbeddings
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
+import httpx
 from azure.storage.blob import BlobServiceClient
 
 # Load environment variables
@@ -41,6 +42,19 @@ client = AzureOpenAI(
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
 )
 
+# === Async Azure OpenAI Client (for FastAPI handlers) ===
+# One pooled HTTP client per worker, shared by every request
+async_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=httpx.Timeout(float(os.getenv("AZURE_OPENAI_TIMEOUT", "60")), connect=5.0)
+)
+async_client = AsyncAzureOpenAI(
+    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    http_client=async_http_client
+)
+
 # === Azure Blob Service Client (direct access) ===
 AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 AZURE_STORAGE_CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONTAINER_NAME")
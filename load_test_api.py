@@ -0,0 +1,212 @@
+# load_test_api.py
+
+"""
+Load test for the non-blocking /chat and /search handlers.
+
+Runs the FastAPI app under uvicorn with a stand-in `config` module whose
+async chat client is deliberately slow (no Azure credentials needed), then:
+1. measures /search latency on its own
+2. measures it again while /chat is saturated with slow completions, and
+   checks that p99 stays flat
+3. checks that a completion exceeding CHAT_TIMEOUT_SECONDS returns 504 and
+   is cancelled
+4. checks that a client disconnecting mid-chat cancels its completion
+5. checks that shutdown closes the shared HTTP client
+
+Usage:
+    python load_test_api.py [--searches 300] [--chats 100] [--max-p99-ratio 3]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import httpx
+import uvicorn
+
+CHAT_DELAY = 1.0     # seconds each stubbed completion takes
+SLOW_CHAT_DELAY = 30.0  # for queries containing "slow": outlives every timeout
+CHAT_TIMEOUT = 2.0
+
+
+class SlowCompletions:
+    """Stands in for AsyncAzureOpenAI().chat.completions."""
+    def __init__(self):
+        self.in_flight = 0
+        self.cancelled = []  # seconds from start to cancellation
+
+    async def create(self, model, messages, temperature=0):
+        started = time.monotonic()
+        delay = SLOW_CHAT_DELAY if "slow" in messages[0]["content"] else CHAT_DELAY
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(time.monotonic() - started)
+            raise
+        finally:
+            self.in_flight -= 1
+        message = types.SimpleNamespace(content="stubbed answer")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def install_stub_config(completions: SlowCompletions) -> httpx.AsyncClient:
+    http_client = httpx.AsyncClient()
+    config = types.ModuleType("config")
+    config.client = None
+    config.async_http_client = http_client
+    config.async_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    sys.modules["config"] = config
+    return http_client
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def time_searches(client: httpx.AsyncClient, total: int, concurrency: int = 10) -> list:
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            started = time.monotonic()
+            response = await client.get("/search", params={"category": "Data Governance"})
+            response.raise_for_status()
+            latencies.append((time.monotonic() - started) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def saturate_chat(base_url: str, concurrency: int, stop, completed):
+    """
+    Runs in its own process: keeps `concurrency` chats in flight until `stop`
+    is set. Driving this many connections from the measuring process would
+    skew the /search timings with the load generator's own latency.
+    """
+    async def run():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            async def worker():
+                while not stop.is_set():
+                    response = await client.post("/chat", json={"query": "Which case studies use Azure?"})
+                    response.raise_for_status()
+                    with completed.get_lock():
+                        completed.value += 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    asyncio.run(run())
+
+
+async def run_checks(base_url: str, args, completions: SlowCompletions) -> list:
+    failures = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        baseline = await time_searches(client, args.searches)
+        base_p50, base_p99 = percentile(baseline, 50), percentile(baseline, 99)
+        print(f"/search alone:          p50 {base_p50:6.1f} ms, p99 {base_p99:6.1f} ms")
+
+        ctx = multiprocessing.get_context("spawn")
+        stop, completed = ctx.Event(), ctx.Value("i", 0)
+        chats = ctx.Process(target=saturate_chat, args=(base_url, args.chats, stop, completed))
+        chats.start()
+        while completions.in_flight < args.chats:
+            await asyncio.sleep(0.05)
+        peak = completions.in_flight
+        loaded = await time_searches(client, args.searches)
+        peak = min(peak, completions.in_flight)
+        stop.set()
+        await asyncio.to_thread(chats.join)
+        load_p50, load_p99 = percentile(loaded, 50), percentile(loaded, 99)
+        print(f"/search, /chat x{args.chats}: p50 {load_p50:6.1f} ms, p99 {load_p99:6.1f} ms "
+              f"({completed.value} chats completed, {peak} in flight)")
+        # Small absolute floor so a very fast baseline does not make noise fatal
+        if load_p99 > max(base_p99 * args.max_p99_ratio, base_p99 + 25):
+            failures.append(f"/search p99 rose from {base_p99:.1f} ms to {load_p99:.1f} ms under /chat load")
+
+        cancelled_before = len(completions.cancelled)
+        started = time.monotonic()
+        response = await client.post("/chat", json={"query": "slow question"})
+        elapsed = time.monotonic() - started
+        print(f"Timed-out chat:         HTTP {response.status_code} after {elapsed:.1f} s")
+        if response.status_code != 504 or len(completions.cancelled) != cancelled_before + 1:
+            failures.append("a chat exceeding CHAT_TIMEOUT_SECONDS was not answered 504 and cancelled")
+
+    # Fresh client so closing its connection is a real disconnect
+    cancelled_before = len(completions.cancelled)
+    async with httpx.AsyncClient(base_url=base_url, timeout=0.5) as client:
+        try:
+            await client.post("/chat", json={"query": "slow question"})
+        except httpx.TimeoutException:
+            pass
+    await asyncio.sleep(1.0)
+    cancelled = completions.cancelled[cancelled_before:]
+    print(f"Disconnected chat:      cancelled after {cancelled[0]:.1f} s" if cancelled
+          else "Disconnected chat:      not cancelled")
+    # Must beat the 2 s timeout, otherwise it was the timeout that fired
+    if not cancelled or cancelled[0] >= CHAT_TIMEOUT:
+        failures.append("a client disconnect did not cancel its chat completion")
+    return failures
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /search while /chat is saturated.")
+    parser.add_argument("--searches", type=int, default=300, help="/search requests per phase")
+    parser.add_argument("--chats", type=int, default=100, help="Concurrent /chat requests")
+    parser.add_argument("--max-p99-ratio", type=float, default=3.0,
+                        help="Allowed growth of /search p99 under /chat load")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Read at import by metadata_store and main
+        os.environ["METADATA_FILE"] = os.path.join(scratch, "metadata.json")
+        os.environ["CHAT_TIMEOUT_SECONDS"] = str(CHAT_TIMEOUT)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "metadata.json"),
+                    os.environ["METADATA_FILE"])
+
+        completions = SlowCompletions()
+        http_client = install_stub_config(completions)
+        from main import app
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        try:
+            failures = asyncio.run(run_checks(f"http://127.0.0.1:{port}", args, completions))
+        finally:
+            server.should_exit = True
+            thread.join()
+
+        print(f"Shared HTTP client closed on shutdown: {http_client.is_closed}")
+        if not http_client.is_closed:
+            failures.append("shutdown did not close the shared HTTP client")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ /search stays flat while /chat is saturated")
+
+
+if __name__ == "__main__":
+    main()
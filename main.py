@@ -1,15 +1,34 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import asyncio
 import os
 import json
 
 from agents.reader_agent import process_case_study
-from agents.categorize_agent import categorize_case_study
-from agents.validation_agent import validate_case_study
-from config import client
+from agents.categorize_agent import categorize_batch, BatchPacker
+from agents.validation_agent import validate_tiered, MERGED_VALIDATION
+from agents.taxonomy_agent import build_taxonomy
+from config import async_client, async_http_client
+from metadata_store import METADATA_FILE, load_metadata, add_metadata, current_version, version_info, metadata_exists
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the pooled connections to Azure OpenAI on shutdown
+    await async_http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-request budget for a chat completion, and how often to check whether
+# the caller is still connected while waiting on it
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT_SECONDS", "60"))
+DISCONNECT_POLL_INTERVAL = 0.5
 
 # Allow frontend requests
 app.add_middleware(
@@ -20,52 +39,134 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-METADATA_FILE = "metadata.json"
+# Compress large JSON bodies (search results, delta feeds)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+
+def etag_for(version: int) -> str:
+    return f'W/"{version}"'
+
+
+def etag_matches(request: Request, version: int) -> bool:
+    """
+    Weak comparison of If-None-Match (a comma-separated list of tags, or *)
+    against the current corpus version.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    ours = f'"{version}"'
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == ours:
+            return True
+    return False
+
+
+async def await_unless_disconnected(task: asyncio.Task, request: Request, timeout: float):
+    """
+    Awaits `task`, cancelling it when the client disconnects or `timeout`
+    elapses so abandoned requests do not hold upstream connections.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(status_code=504, detail="Chat completion timed out")
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_INTERVAL, remaining))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 @app.post("/process")
 async def process_files(files: List[UploadFile]):
-    # Load existing metadata if available
-    if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, "r", encoding="utf-8") as f:
-            existing_metadata = json.load(f)
-    else:
-        existing_metadata = []
-
-    # Create a lookup for existing filenames
+    # Snapshot of existing metadata; the authoritative merge happens under
+    # the store's lock so concurrent workers cannot drop each other's records
+    existing_metadata = await run_in_threadpool(load_metadata)
     existing_files = {m["file_name"]: m for m in existing_metadata}
-    all_metadata = existing_metadata.copy()
+    taxonomy = build_taxonomy(existing_metadata)
 
+    # Extract text from new files; the agents block, so run them off the event loop
+    texts = {}
     for file in files:
-        if file.filename in existing_files:
-            # Reuse existing metadata
-            metadata = existing_files[file.filename]
-        else:
-            # Process new file
+        if file.filename not in existing_files and file.filename not in texts:
             file_bytes = await file.read()
-            case_text, _ = process_case_study(file.filename, file_bytes)
-
-            categorization = categorize_case_study(case_text)
-            validation = validate_case_study(
-                categorization.get("category", ""),
-                categorization.get("domain", ""),
-                categorization.get("technology", "")
-            )
-
-            metadata = {
-                "file_name": file.filename,
-                "summary": categorization.get("summary", ""),
-                "category": categorization.get("category", ""),
-                "domain": categorization.get("domain", ""),
-                "technology": categorization.get("technology", ""),
-                **validation  # Embed validation scores directly
-            }
-            all_metadata.append(metadata)
+            case_text, _ = await run_in_threadpool(process_case_study, file.filename, file_bytes)
+            texts[file.filename] = case_text
+
+    # Pack small documents into batched categorization requests (token
+    # counting is CPU work, and the first call may load the encoding)
+    def pack_batches():
+        packer = BatchPacker()
+        return [packer.add(name, text) for name, text in texts.items()] + [packer.flush()]
+
+    batches = await run_in_threadpool(pack_batches)
+    categorizations = {}
+    for result in await asyncio.gather(*(
+        run_in_threadpool(categorize_batch, batch, MERGED_VALIDATION) for batch in batches if batch
+    )):
+        categorizations.update(result)
+
+    async def analyze(name):
+        categorization = categorizations[name]
+        validation = await run_in_threadpool(validate_tiered, categorization, texts[name], taxonomy)
+        return {
+            "file_name": name,
+            "summary": categorization.get("summary", ""),
+            "category": categorization.get("category", ""),
+            "domain": categorization.get("domain", ""),
+            "technology": categorization.get("technology", ""),
+            **validation  # Embed validation scores directly
+        }
+
+    for metadata in await asyncio.gather(*(analyze(name) for name in texts)):
+        existing_files[metadata["file_name"]] = metadata
+
+    # Reuse existing metadata for files already processed
+    records = [existing_files[file.filename] for file in files]
 
     # Save updated metadata with embedded validation
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(all_metadata, f, indent=4, ensure_ascii=False)
+    touched, version = await run_in_threadpool(add_metadata, records)
+
+    # Only return the records this request touched; clients pull the rest
+    # from /metadata?since=<version>
+    return {"metadata": touched, "version": version}
+
 
-    return {"metadata": all_metadata}
+@app.get("/metadata")
+async def metadata_delta(request: Request, response: Response, since: Optional[int] = None):
+    """
+    Delta feed: returns only the records written after version `since` plus
+    the current version. Returns the full corpus with "full": true when
+    `since` is omitted or predates the last wholesale replace (which may have
+    removed records); clients then replace their copy instead of merging.
+    """
+    # Version first: a concurrent write can then only make the records newer
+    # than the version we report, so a client never skips one
+    version, reset_version = await run_in_threadpool(version_info)
+    etag = etag_for(version)
+    if etag_matches(request, version):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    metadata = await run_in_threadpool(load_metadata)
+
+    full = since is None or since < reset_version
+    if not full:
+        metadata = [m for m in metadata if m.get("version", 0) > since]
+
+    response.headers["ETag"] = etag
+    return {"metadata": metadata, "version": version, "full": full}
 
 
 
@@ -92,13 +193,14 @@ class QueryRequest(BaseModel):
     query: str
 
 @app.post("/chat")
-async def chat_with_metadata(request: QueryRequest):
+async def chat_with_metadata(request: QueryRequest, http_request: Request):
     query = request.query
 
-    # Read metadata.json content
+    # Read metadata.json content (off the event loop)
     try:
-        with open(METADATA_FILE, "r", encoding="utf-8") as f:
-            metadata_parsed = json.load(f)
+        if not metadata_exists():
+            raise FileNotFoundError(METADATA_FILE)
+        metadata_parsed = await run_in_threadpool(load_metadata)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid or missing metadata JSON file")
 
@@ -109,30 +211,39 @@ async def chat_with_metadata(request: QueryRequest):
 
     # Step 2: Use Azure OpenAI LLM
     try:
-        context_text = json.dumps(metadata_parsed, indent=2)
+        context_text = await run_in_threadpool(json.dumps, metadata_parsed, indent=2)
         prompt = (
             f"Answer the following question using this case study metadata. Format the response in Markdown:\n"
             f"{context_text}\n\nQuestion: {query}"
         )
 
-
-        response = client.chat.completions.create(
+        completion = asyncio.create_task(async_client.chat.completions.create(
             model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"),
             messages=[{"role": "user", "content": prompt}],
             temperature=0
-        )
+        ))
+        response = await await_unless_disconnected(completion, http_request, CHAT_TIMEOUT)
         bot_reply = response.choices[0].message.content.strip()
         return {"response": bot_reply}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/search")
-async def search(category: str = None, domain: str = None):
-    if not os.path.exists(METADATA_FILE):
+async def search(request: Request, response: Response, category: str = None, domain: str = None):
+    if not metadata_exists():
         raise HTTPException(status_code=400, detail="Metadata file not found. Please process case studies first.")
 
-    with open(METADATA_FILE, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    # Results only change when the corpus does, so the version is a valid
+    # validator for every filter combination on this URL
+    version = await run_in_threadpool(current_version)
+    etag = etag_for(version)
+    if etag_matches(request, version):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    metadata = await run_in_threadpool(load_metadata)
 
     filtered = metadata
 
@@ -0,0 +1,209 @@
+# metadata_store.py
+
+"""
+Process-safe persistence for metadata.json.
+
+Several uvicorn workers (or replicas sharing a volume) may read and write the
+metadata file at once, so:
+- writers serialize on a lock file and re-read the file under the lock before
+  merging their records, so overlapping /process calls never drop records
+- the file is replaced atomically (temp file + rename), so readers never see
+  a half-written file
+- a version sidecar holds a corpus counter that only ever increases. It is
+  bumped after every write, so readers in other workers can tell whether
+  their cached copy is stale without parsing JSON, and it backs the ETags
+  and the `since` delta feed
+- the sidecar also records the reset version: the last version at which the
+  corpus was replaced wholesale. Records dropped by a replace never show up
+  in a delta, so a client synced before it must reload the full snapshot
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from filelock import FileLock
+
+METADATA_FILE = os.getenv("METADATA_FILE", "metadata.json")
+VERSION_FILE = METADATA_FILE + ".version"
+LOCK_FILE = METADATA_FILE + ".lock"
+
+# Read once at import: os.umask can only be queried by setting it, which
+# would race with other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_cache = {"stamp": None, "metadata": []}
+_cache_lock = threading.Lock()
+
+
+def corpus_version(metadata: list) -> int:
+    """
+    The highest version stamped on any record. Records written before
+    versioning existed count as version 0. This is only a floor for the
+    counter: the records can be overwritten (e.g. by app.py) and lose their
+    stamps, so use current_version() for the corpus version.
+    """
+    return max((m.get("version", 0) for m in metadata), default=0)
+
+
+def _atomic_write(path: str, text: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        # mkstemp creates the file 0600 and os.replace keeps that mode, which
+        # would lock out readers running as another user
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_file() -> list:
+    if not os.path.exists(METADATA_FILE):
+        return []
+    with open(METADATA_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_sidecar():
+    # "<version> <reset version>"; sidecars from before resets were tracked
+    # hold only the version
+    try:
+        with open(VERSION_FILE, "r", encoding="utf-8") as f:
+            fields = [int(field) for field in f.read().split()]
+    except (FileNotFoundError, ValueError):
+        return None
+    if not fields:
+        return None
+    return fields[0], fields[1] if len(fields) > 1 else 0
+
+
+def _write_sidecar(version: int, reset_version: int):
+    # Must hold the lock
+    _atomic_write(VERSION_FILE, f"{version} {reset_version}")
+
+
+def read_version():
+    """
+    Cheap staleness check: returns the version recorded in the sidecar, or
+    None when the sidecar is missing (file never written by this store).
+    """
+    sidecar = _read_sidecar()
+    return sidecar[0] if sidecar else None
+
+
+def version_info() -> tuple:
+    """
+    Returns (version, reset_version). The version is a counter that is bumped
+    on every write and never goes backwards; reset_version is the last
+    version at which replace_metadata() ran (0 if never). Falls back to the
+    record stamps of the cached metadata when the sidecar is missing.
+
+    Read this *before* load_metadata(); a write in between then only makes
+    the returned data newer than its version, never older.
+    """
+    sidecar = _read_sidecar()
+    if sidecar is not None:
+        return sidecar
+    return corpus_version(load_metadata()), 0
+
+
+def current_version() -> int:
+    """The corpus version; see version_info()."""
+    return version_info()[0]
+
+
+def _next_version(metadata: list) -> int:
+    # Must hold the lock
+    return max(read_version() or 0, corpus_version(metadata)) + 1
+
+
+def metadata_exists() -> bool:
+    return os.path.exists(METADATA_FILE)
+
+
+def _file_stamp():
+    # The mtime catches writers that bypass this module (e.g. app.py)
+    try:
+        return read_version(), os.stat(METADATA_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_metadata() -> list:
+    """
+    Returns the current metadata list. The parsed file is cached per process
+    and only re-read when the version sidecar or the file's mtime changes.
+    """
+    stamp = _file_stamp()
+    with _cache_lock:
+        if stamp is not None and stamp == _cache["stamp"]:
+            return _cache["metadata"]
+
+    metadata = _read_file()
+    with _cache_lock:
+        _cache["stamp"] = stamp
+        _cache["metadata"] = metadata
+    return metadata
+
+
+def add_metadata(records: list):
+    """
+    Appends records for files that are not already in metadata.json and
+    stamps them with the next corpus version.
+
+    Returns (records, version): for each input record, the stored record for
+    that file name (the existing one if another writer got there first) and
+    the corpus version after the call.
+    """
+    # A fresh lock per call: FileLock instances must not be shared across
+    # forked workers
+    with FileLock(LOCK_FILE):
+        metadata = _read_file()
+        existing_files = {m["file_name"]: m for m in metadata}
+        new_version = _next_version(metadata)
+
+        stored = []
+        added = False
+        for record in records:
+            if record["file_name"] not in existing_files:
+                record = {**record, "version": new_version}
+                metadata.append(record)
+                existing_files[record["file_name"]] = record
+                added = True
+            stored.append(existing_files[record["file_name"]])
+
+        if added:
+            _atomic_write(METADATA_FILE, json.dumps(metadata, indent=4, ensure_ascii=False))
+            _write_sidecar(new_version, (_read_sidecar() or (0, 0))[1])
+            version = new_version
+        else:
+            version = current_version()
+
+    return stored, version
+
+
+def replace_metadata(records: list) -> int:
+    """
+    Replaces metadata.json wholesale (as the Streamlit app does) and bumps the
+    corpus version so cached copies and ETags are invalidated. The new version
+    is also recorded as the reset version, since records may have been removed.
+    """
+    with FileLock(LOCK_FILE):
+        new_version = _next_version(_read_file())
+        records = [{**record, "version": new_version} for record in records]
+        _atomic_write(METADATA_FILE, json.dumps(records, indent=4, ensure_ascii=False))
+        _write_sidecar(new_version, new_version)
+    return new_version
@@ -0,0 +1,181 @@
+# stress_test_metadata.py
+
+"""
+Stress test for concurrent /process calls across workers.
+
+Starts several uvicorn processes serving main:app against one scratch
+metadata.json (as `uvicorn --workers` or replicas on a shared volume would),
+with a stand-in `config` module whose chat client returns canned JSON after a
+short delay (no Azure credentials needed). Then POSTs overlapping /process
+uploads round-robin across the servers, where many requests upload the same
+files, and checks that every file name was stored exactly once and that the
+corpus version advanced.
+
+Usage:
+    python stress_test_metadata.py [--servers 4] [--requests 120] [--files 60] [--per-request 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+import httpx
+
+STUB_CONFIG = '''
+# Stand-in for config.py: canned completions, no Azure clients
+import json
+import re
+import time
+import types
+
+import httpx
+
+def _reply(content):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+def _categorization():
+    return {"summary": "A stubbed summary.", "category": "Data Governance",
+            "domain": "Retail", "technology": "Azure"}
+
+class _Completions:
+    def create(self, model, messages, temperature=0, **kwargs):
+        time.sleep(0.05)  # long enough for requests to overlap
+        prompt = messages[0]["content"]
+        if prompt.lstrip().startswith("Validate"):
+            return _reply('{"category_confidence": 0.9, "domain_confidence": 0.9, "technology_confidence": 0.9}')
+        ids = re.findall(r'<case_study id="(doc-[0-9]+)">', prompt)
+        if ids:
+            return _reply(json.dumps({"results": [{"id": i, **_categorization()} for i in ids]}))
+        return _reply(json.dumps(_categorization()))
+
+client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=_Completions()))
+async_http_client = httpx.AsyncClient()
+async_client = None
+'''
+
+
+def make_pdf(text: str) -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_servers(count: int, scratch: str) -> tuple:
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env["METADATA_FILE"] = os.path.join(scratch, "metadata.json")
+    # The stub config in `scratch` shadows the real one; the rest comes from the repo
+    env["PYTHONPATH"] = os.pathsep.join([scratch, repo, env.get("PYTHONPATH", "")])
+    ports = [free_port() for _ in range(count)]
+    servers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", scratch,
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=env, cwd=scratch
+        )
+        for port in ports
+    ]
+    return servers, [f"http://127.0.0.1:{port}" for port in ports]
+
+
+async def wait_until_up(base_urls: list, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        for url in base_urls:
+            while True:
+                try:
+                    await client.get(f"{url}/metadata", params={"since": 0})
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"{url} did not start")
+                    await asyncio.sleep(0.1)
+
+
+async def post_uploads(base_urls: list, uploads: list, pdfs: dict) -> list:
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def post(i, names):
+            files = [("files", (name, pdfs[name], "application/pdf")) for name in names]
+            response = await client.post(f"{base_urls[i % len(base_urls)]}/process", files=files)
+            response.raise_for_status()
+            return response.json()
+
+        return await asyncio.gather(*(post(i, names) for i, names in enumerate(uploads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress-test concurrent /process calls across workers.")
+    parser.add_argument("--servers", type=int, default=4, help="uvicorn processes sharing metadata.json")
+    parser.add_argument("--requests", type=int, default=120, help="Concurrent /process calls")
+    parser.add_argument("--files", type=int, default=60, help="Distinct files to draw uploads from")
+    parser.add_argument("--per-request", type=int, default=5, help="Files uploaded per call")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [f"case-{i}.pdf" for i in range(args.files)]
+    pdfs = {name: make_pdf(f"Retail data governance on Azure, case {name}.") for name in names}
+    # Overlapping uploads: most files are sent by several requests at once
+    uploads = [rng.sample(names, args.per_request) for _ in range(args.requests)]
+    uploaded = {name for names_ in uploads for name in names_}
+
+    with tempfile.TemporaryDirectory() as scratch:
+        with open(os.path.join(scratch, "config.py"), "w", encoding="utf-8") as f:
+            f.write(STUB_CONFIG)
+        servers, base_urls = start_servers(args.servers, scratch)
+        try:
+            asyncio.run(wait_until_up(base_urls))
+            started = time.monotonic()
+            responses = asyncio.run(post_uploads(base_urls, uploads, pdfs))
+            elapsed = time.monotonic() - started
+        finally:
+            for server in servers:
+                server.terminate()
+            for server in servers:
+                server.wait()
+
+        with open(os.path.join(scratch, "metadata.json"), "r", encoding="utf-8") as f:
+            stored = [m["file_name"] for m in json.load(f)]
+        with open(os.path.join(scratch, "metadata.json.version"), "r", encoding="utf-8") as f:
+            version = int(f.read().split()[0])
+
+    print(f"{args.requests} /process calls across {args.servers} servers in {elapsed:.2f}s")
+    print(f"Records stored: {len(stored)} (expected {len(uploaded)}), corpus version {version}")
+
+    failures = []
+    if sorted(stored) != sorted(uploaded):
+        duplicated = sorted({n for n in stored if stored.count(n) > 1})
+        missing = sorted(uploaded - set(stored))
+        failures.append(f"stored file names differ: {len(missing)} missing, {len(duplicated)} duplicated")
+    for names_, response in zip(uploads, responses):
+        if sorted(m["file_name"] for m in response["metadata"]) != sorted(names_):
+            failures.append("a /process response did not return every file it uploaded")
+            break
+    if not 1 <= version <= args.requests:
+        failures.append(f"unexpected corpus version {version}")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Every uploaded file stored exactly once")
+
+
+if __name__ == "__main__":
+    main()
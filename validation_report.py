@@ -0,0 +1,61 @@
+# validation_report.py
+
+"""
+Estimates how many LLM calls tiered validation saves on the current corpus.
+
+Each record in metadata.json is scored by the local tier against a taxonomy
+learned from every *other* record (leave-one-out, so a record never matches
+itself), using its summary as the source text. Records at or above the
+confidence threshold would skip the LLM validation call.
+
+Usage:
+    python validation_report.py [--threshold 0.8]
+"""
+
+import argparse
+import os
+from collections import Counter
+
+from agents.taxonomy_agent import build_taxonomy, score_locally
+from metadata_store import load_metadata
+
+FIELDS = ("category_confidence", "domain_confidence", "technology_confidence")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report LLM calls saved by tiered validation.")
+    parser.add_argument("--threshold", type=float,
+                        default=float(os.getenv("VALIDATION_CONFIDENCE_THRESHOLD", "0.8")))
+    args = parser.parse_args()
+
+    metadata = load_metadata()
+    if not metadata:
+        print("No metadata found. Please process case studies first.")
+        return
+
+    full = build_taxonomy(metadata)
+    local_only = 0
+    drift = Counter()
+    for m in metadata:
+        taxonomy = {field: full[field] - build_taxonomy([m])[field] for field in full}
+        scores = score_locally(m, m.get("summary", ""), taxonomy)
+        if min(scores.values()) >= args.threshold:
+            local_only += 1
+        for field in FIELDS:
+            if field in m:
+                drift[field] += abs(scores[field] - float(m[field]))
+
+    n = len(metadata)
+    escalated = n - local_only
+    print(f"Records:                          {n}")
+    print(f"Resolved by local tier:           {local_only} ({local_only / n:.0%})")
+    print(f"Escalated to LLM validation:      {escalated}")
+    print(f"LLM calls, categorize + validate: {2 * n}")
+    print(f"LLM calls, tiered:                {n + escalated} (saves {local_only})")
+    print(f"LLM calls, tiered + merged:       {n} (saves {n})")
+    for field in FIELDS:
+        print(f"Mean |local - stored| {field}: {drift[field] / n:.2f}")
+
+
+if __name__ == "__main__":
+    main()